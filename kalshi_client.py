@@ -1,17 +1,44 @@
-import base64
+import binascii
 import datetime
+import functools
+import hashlib
+import itertools
 import json
+import logging
+import queue
+import secrets
+import threading
 import time
-import uuid
 from enum import Enum
+from urllib.parse import urlencode
 
-import requests
+import httpx
+import orjson
+from websockets.sync.client import connect as ws_connect
 from cryptography.hazmat.primitives import hashes
-from cryptography.hazmat.primitives.asymmetric import padding
+from cryptography.hazmat.primitives.asymmetric import padding, utils
 from cryptography.hazmat.backends import default_backend
 from cryptography.hazmat.primitives import serialization
 from cryptography.exceptions import InvalidSignature
 
+_PSS_PADDING = padding.PSS(mgf=padding.MGF1(hashes.SHA256()), salt_length=padding.PSS.DIGEST_LENGTH)
+_PREHASHED_SHA256 = utils.Prehashed(hashes.SHA256())
+
+logger = logging.getLogger(__name__)
+
+# One HTTP/2 client shared by every Kalshi client in the process, so market data and
+# order requests multiplex over the same persistent TLS connection. The transport
+# retries failed connection attempts; Brotli responses are decoded via the brotli package.
+_HTTP_CLIENT = httpx.Client(
+    transport=httpx.HTTPTransport(
+        http2=True,
+        retries=2,
+        limits=httpx.Limits(max_keepalive_connections=20, max_connections=64),
+    ),
+    headers={"Accept-Encoding": "br, gzip"},
+    timeout=5.0,
+)
+
 
 class Environment(Enum):
     """Enumeration for Kalshi API environments."""
@@ -19,9 +46,61 @@ class Environment(Enum):
     PROD = "prod"
 
 
+class APIRequestError(Exception):
+    """A failed Kalshi API request, with the HTTP status code if a response was received."""
+
+    def __init__(self, message: str, status_code: int = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class TokenBucket:
+    """Thread-safe token bucket for keeping requests under an API rate limit."""
+
+    def __init__(self, rate: float, capacity: float):
+        """
+        Args:
+            rate (float): Tokens added per second.
+            capacity (float): Maximum number of tokens that can accumulate for a burst.
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: float = 1):
+        """Blocks only until enough tokens are available, then takes them."""
+        tokens = min(tokens, self.capacity)
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def limit_to(self, remaining: float):
+        """Caps the available tokens at the budget the server reports as remaining."""
+        with self._lock:
+            self._tokens = min(self._tokens, remaining)
+
+
 class KalshiBaseClient:
     """Base client for authenticating and interacting with the Kalshi API."""
 
+    _WS_PATH = "/trade-api/ws/v2"
+    # Requests per second allowed by Kalshi's basic API tier
+    RATE_LIMIT = 10
+    # Transient GET failures worth retrying, and the backoff before each retry in seconds
+    RETRY_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+    RETRY_DELAYS = (0.1, 0.25, 0.5)
+    # Most GET responses kept for conditional requests before the oldest is dropped
+    ETAG_CACHE_SIZE = 512
+
     def __init__(
         self,
         key_id: str,
@@ -53,21 +132,40 @@ class KalshiBaseClient:
             self.api_base = "https://api.elections.kalshi.com/"
         else:
             raise ValueError("Invalid environment specified.")
+        self.ws_url = self.api_base.rstrip('/').replace('https://', 'wss://', 1) + self._WS_PATH
             
-        self.session = requests.Session()
-        print(f"KalshiBaseClient initialized for {self.environment.name} environment.")
+        self.session = _HTTP_CLIENT
+        self._bucket = TokenBucket(rate=self.RATE_LIMIT, capacity=self.RATE_LIMIT)
+        # Encoded method+path suffixes of the signed message, keyed by (method, path)
+        self._method_path_cache = {}
+        # Requests to the same path within one millisecond sign an identical message,
+        # so a burst can reuse one signature instead of signing again
+        self._sign = functools.lru_cache(maxsize=256)(
+            functools.partial(self._create_signature, self.private_key)
+        )
+        # (ETag, raw body) of recent GET responses keyed by URL, so unchanged
+        # resources can be revalidated with If-None-Match instead of re-downloaded
+        self._etags = {}
+        self._etags_lock = threading.Lock()
+        logger.info("KalshiBaseClient initialized for %s environment.", self.environment.name)
 
     def _create_signature(self, private_key, timestamp, method, path):
         """Create the request signature."""
         # Strip query parameters before signing
         path_without_query = path.split('?')[0]
-        message = f"{timestamp}{method}{path_without_query}".encode('utf-8')
+        method_path = self._method_path_cache.get((method, path_without_query))
+        if method_path is None:
+            method_path = f"{method}{path_without_query}".encode('utf-8')
+            self._method_path_cache[(method, path_without_query)] = method_path
+        # Hash with hashlib and sign the digest directly; this verifies exactly like
+        # signing the full message with SHA256
+        digest = hashlib.sha256(timestamp.encode('ascii') + method_path).digest()
         signature = private_key.sign(
-            message,
-            padding.PSS(mgf=padding.MGF1(hashes.SHA256()), salt_length=padding.PSS.DIGEST_LENGTH),
-            hashes.SHA256()
+            digest,
+            _PSS_PADDING,
+            _PREHASHED_SHA256
         )
-        return base64.b64encode(signature).decode('utf-8')
+        return binascii.b2a_base64(signature, newline=False).decode('ascii')
 
     def _get_request_headers(self, method: str, path_with_query: str) -> dict:
         """Generates the required authentication headers for an API request."""
@@ -75,7 +173,7 @@ class KalshiBaseClient:
         
         path_without_query = path_with_query.split('?')[0]
         
-        signature = self._create_signature(self.private_key, timestamp_str, method, path_without_query)
+        signature = self._sign(timestamp_str, method, path_without_query)
         
         return {
             "KALSHI-ACCESS-KEY": self.key_id,
@@ -86,34 +184,103 @@ class KalshiBaseClient:
     def _send_request(self, method: str, path: str, params: dict = None, payload: dict = None):
         """Sends a signed request to the Kalshi API."""
         
-        # Construct the full path with query string to pass to the signing function
-        full_path = path
-        if params:
-            query_string = '&'.join([f'{k}={v}' for k, v in params.items()])
-            full_path += '?' + query_string
+        # Construct the full path with query string once; it is both signed and sent as-is
+        full_path = (path + '?' + urlencode(params, doseq=True)) if params else path
         
-        headers = self._get_request_headers(method, full_path)
-        url = f"{self.api_base}{path}"
+        url = self.api_base + full_path
+        is_get = method.upper() == 'GET'
+        cached = self._etags.get(url) if is_get else None
 
-        try:
-            print(f"Sending {method.upper()} request to {url}")
-            print(f"Headers: {headers}")
-            print(f"URL: {url}")
-            response = self.session.request(method.upper(), url, headers=headers, params=params, json=payload)
-            response.raise_for_status()
-            # For Kalshi, 204 No Content is a valid success response for some endpoints
-            if response.status_code == 204:
-                return None
-            return response.json()
-        except requests.exceptions.RequestException as e:
-            if hasattr(e, 'response') and e.response is not None:
+        # Only GETs are safe to resend after a timeout or server error; a POST may already
+        # have been applied, so it is only retried when the connection never opened
+        for attempt, delay in enumerate(self.RETRY_DELAYS + (None,)):
+            # Wait for rate-limit budget before signing so the timestamp is fresh when sent
+            self._bucket.acquire()
+            headers = self._get_request_headers(method, full_path)
+            if cached is not None:
+                headers['If-None-Match'] = cached[0]
+
+            try:
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("Sending %s request to %s", method.upper(), url)
+                response = self.session.request(method.upper(), url, headers=headers, json=payload)
+                self._sync_rate_limit(response)
+                # Not Modified: the body we received last time is still current. It is
+                # parsed again so every caller gets its own objects to mutate
+                if response.status_code == 304 and cached is not None:
+                    return orjson.loads(cached[1])
+                response.raise_for_status()
+                # For Kalshi, 204 No Content is a valid success response for some endpoints
+                if response.status_code == 204:
+                    return None
+                etag = response.headers.get('ETag')
+                if etag is not None and is_get:
+                    self._store_etag(url, etag, response.content)
+                return orjson.loads(response.content)
+            except httpx.HTTPStatusError as e:
+                if delay is not None and is_get and e.response.status_code in self.RETRY_STATUS_CODES:
+                    delay = self._retry_delay(e.response, delay)
+                    logger.warning("%s %s returned %d, retrying in %.2fs (attempt %d)",
+                                   method.upper(), path, e.response.status_code, delay, attempt + 1)
+                    time.sleep(delay)
+                    continue
                 try:
                     error_details = e.response.json()
-                except (ValueError, AttributeError):
-                    error_details = e.response.text if hasattr(e.response, 'text') else 'No details available'
-                raise Exception(f"API request failed: {e.response.status_code} - {error_details}")
-            else:
-                raise Exception(f"API request failed: {str(e)}")
+                except ValueError:
+                    error_details = e.response.text
+                raise APIRequestError(f"API request failed: {e.response.status_code} - {error_details}",
+                                      e.response.status_code)
+            except httpx.TransportError as e:
+                # Connection failures and timeouts
+                if delay is not None and (is_get or isinstance(e, httpx.ConnectError)):
+                    logger.warning("%s %s failed (%s), retrying in %.2fs (attempt %d)",
+                                   method.upper(), path, e, delay, attempt + 1)
+                    time.sleep(delay)
+                    continue
+                raise APIRequestError(f"API request failed: {str(e)}")
+            except httpx.HTTPError as e:
+                raise APIRequestError(f"API request failed: {str(e)}")
+
+    def _store_etag(self, url: str, etag: str, body: bytes):
+        """Remembers a GET response for revalidation, evicting the oldest once the cache is full."""
+        with self._etags_lock:
+            self._etags.pop(url, None)
+            self._etags[url] = (etag, body)
+            if len(self._etags) > self.ETAG_CACHE_SIZE:
+                self._etags.pop(next(iter(self._etags)), None)
+
+    @staticmethod
+    def _retry_delay(response, delay: float) -> float:
+        """Returns the backoff delay, stretched to the server's Retry-After if it asks for longer."""
+        retry_after = response.headers.get('Retry-After')
+        if retry_after is not None and retry_after.isdigit():
+            return max(delay, float(retry_after))
+        return delay
+
+    def _sync_rate_limit(self, response):
+        """Adjusts the local rate limiter to what the server says is left of the budget."""
+        if response.status_code == 429:
+            # Rate limited: stop all threads sharing this client until tokens refill
+            self._bucket.limit_to(0)
+            return
+        remaining = response.headers.get('X-RateLimit-Remaining')
+        if remaining is not None and remaining.isdigit():
+            self._bucket.limit_to(int(remaining))
+
+    def _ws_connect(self):
+        """Opens an authenticated connection to the Kalshi WebSocket API."""
+        headers = self._get_request_headers('GET', self._WS_PATH)
+        return ws_connect(self.ws_url, additional_headers=headers)
+
+    def warm_connection(self):
+        """
+        Opens a pooled connection to the API ahead of time so the first order
+        doesn't pay for the TCP and TLS handshakes.
+        """
+        try:
+            self._send_request('GET', '/trade-api/v2/exchange/status')
+        except Exception as e:
+            logger.warning("Could not warm up API connection: %s", e)
 
 
 class KalshiTrader(KalshiBaseClient):
@@ -122,27 +289,97 @@ class KalshiTrader(KalshiBaseClient):
     and request handling from KalshiBaseClient.
     """
 
-    def _place_order(self, ticker, action, side, count, price_cents, expiration_ts=None):
-        """A private method to place a limit order."""
+    # Kalshi accepts at most this many orders per batched request
+    MAX_BATCH_ORDERS = 20
+
+    _ORDERS_PATH = "/trade-api/v2/portfolio/orders"
+    _BATCHED_ORDERS_PATH = "/trade-api/v2/portfolio/orders/batched"
+    # Statuses meaning the batched endpoint isn't available to this account (e.g. its API tier)
+    _BATCH_UNAVAILABLE_STATUS_CODES = (403, 404)
+    # Cleared on the instance the first time the batched endpoint is refused
+    _batch_supported = True
+
+    # client_order_id only has to be unique per account, so use a random per-process
+    # prefix plus a counter seeded from the start time instead of a fresh UUID per order
+    _id_prefix = secrets.token_hex(4)
+    _id_counter = itertools.count(int(time.time() * 1000) << 16)
+
+    def _build_order_payload(self, ticker, action, side, count, price_cents, expiration_ts=None):
+        """Builds the JSON payload for a single limit order."""
         if not 1 <= price_cents <= 99:
             raise ValueError("Price must be in cents, between 1 and 99.")
 
-        path = "/trade-api/v2/portfolio/orders"
         order_payload = {
-            "client_order_id": str(uuid.uuid4()),
+            "client_order_id": f"{KalshiTrader._id_prefix}{next(KalshiTrader._id_counter):x}",
             "ticker": ticker,
             "action": action,
             "side": side,
             "count": count,
             "type": "limit",
-            "yes_price": price_cents if side == 'yes' else None,
-            "no_price": price_cents if side == 'no' else None,
-            "expiration_ts": expiration_ts,
+            "yes_price" if side == 'yes' else "no_price": price_cents,
         }
-        
-        order_payload = {k: v for k, v in order_payload.items() if v is not None}
-        print(f"Placing order: {order_payload} - {path}")
-        return self._send_request('POST', path, payload=order_payload)
+        if expiration_ts is not None:
+            order_payload["expiration_ts"] = expiration_ts
+        return order_payload
+
+    def _place_order(self, ticker, action, side, count, price_cents, expiration_ts=None):
+        """A private method to place a limit order."""
+        order_payload = self._build_order_payload(ticker, action, side, count, price_cents, expiration_ts)
+        logger.debug("Placing order: %s - %s", order_payload, self._ORDERS_PATH)
+        return self._send_request('POST', self._ORDERS_PATH, payload=order_payload)
+
+    def place_orders_batch(self, orders: list) -> dict:
+        """
+        Places several limit orders using Kalshi's batched orders endpoint.
+
+        If the account can't use the batched endpoint, orders are placed one at a
+        time instead, for this and every later call.
+
+        Args:
+            orders: List of dicts with the keyword arguments of a single order:
+                ticker, action, side, count, price_cents and optionally expiration_ts.
+
+        Returns:
+            dict: {"orders": [...]} with one result per order, in the order given.
+                  Requests larger than MAX_BATCH_ORDERS are split into several calls.
+        """
+        payloads = [self._build_order_payload(**order) for order in orders]
+
+        results = []
+        for i in range(0, len(payloads), self.MAX_BATCH_ORDERS):
+            chunk = payloads[i:i + self.MAX_BATCH_ORDERS]
+            if not self._batch_supported:
+                results.extend(self._place_orders_singly(chunk))
+                continue
+            logger.debug("Placing batch of %d orders - %s", len(chunk), self._BATCHED_ORDERS_PATH)
+            try:
+                response = self._send_request('POST', self._BATCHED_ORDERS_PATH, payload={"orders": chunk})
+            except APIRequestError as e:
+                if e.status_code not in self._BATCH_UNAVAILABLE_STATUS_CODES:
+                    raise
+                logger.warning("Batched orders unavailable (%s), placing orders one at a time", e)
+                self._batch_supported = False
+                results.extend(self._place_orders_singly(chunk))
+                continue
+            results.extend(response.get('orders', []) if response else [])
+        return {"orders": results}
+
+    def _place_orders_singly(self, payloads: list) -> list:
+        """Places order payloads one request each, returning results shaped like the batched endpoint's."""
+        results = []
+        for order_payload in payloads:
+            logger.debug("Placing order: %s - %s", order_payload, self._ORDERS_PATH)
+            try:
+                response = self._send_request('POST', self._ORDERS_PATH, payload=order_payload)
+            except APIRequestError as e:
+                # Without a response the order may have been placed, so let that propagate
+                # like a failed batch instead of reporting it as rejected
+                if e.status_code is None:
+                    raise
+                results.append({"error": str(e)})
+                continue
+            results.append({"order": response.get('order') if response else None})
+        return results
 
     def buy_yes(self, ticker: str, count: int, limit_price_cents: int, expiration_ts: int = None) -> dict:
         """Places a limit order to BUY 'yes' contracts."""
@@ -165,6 +402,9 @@ class KalshiMarketData(KalshiBaseClient):
     A client for retrieving market data from the Kalshi platform.
     """
 
+    # Kalshi allows more reads per second than writes
+    RATE_LIMIT = 20
+
     def get_events(self, **params) -> dict:
         """
         Retrieves a list of events, filtered by optional parameters.
@@ -173,13 +413,15 @@ class KalshiMarketData(KalshiBaseClient):
         """
         return self._send_request('GET', '/trade-api/v2/events', params=params)
 
-    def get_markets_paginated(self, limit=None, **params):
+    def get_markets_paginated(self, limit=None, prefetch=2, **params):
         """
         Generator that yields markets one page at a time.
-        Handles pagination automatically.
+        Handles pagination automatically. A background thread keeps fetching pages
+        into a bounded queue while the caller processes earlier ones.
         
         Args:
             limit: Number of markets per page (optional, API default is used if not specified)
+            prefetch: Maximum number of fetched pages waiting for the caller
             **params: Additional query parameters (e.g., series_ticker='SPORT', status='open')
         
         For example: 
@@ -187,63 +429,315 @@ class KalshiMarketData(KalshiBaseClient):
             for market in markets_batch:
                 # process market
         """
-        cursor = None
+        path = '/trade-api/v2/markets'
         
         if limit is not None:
             params['limit'] = limit
         
-        while True:
-            if cursor:
-                params['cursor'] = cursor
-            
-            response = self._send_request('GET', '/trade-api/v2/markets', params=params)
-            markets = response.get('markets', [])
-            
-            if markets:
-                yield markets
-            
-            cursor = response.get('cursor')
-            if not cursor:
-                break
+        pages = queue.Queue(maxsize=prefetch)
+        stopped = threading.Event()
+        done = object()
+        
+        def put(item):
+            # Give up if the caller stops iterating while the queue is full
+            while not stopped.is_set():
+                try:
+                    pages.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+        
+        def fetch_pages():
+            cursor = None
+            try:
+                while True:
+                    response = self._send_request('GET', path, params={**params, 'cursor': cursor} if cursor else params)
+                    markets = response.get('markets', [])
+                    if markets and not put(markets):
+                        return
+                    cursor = response.get('cursor')
+                    if not cursor:
+                        break
+            except Exception as e:
+                put(e)
+                return
+            put(done)
+        
+        threading.Thread(target=fetch_pages, name="kalshi-markets-prefetch", daemon=True).start()
+        try:
+            while True:
+                item = pages.get()
+                if item is done:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            stopped.set()
 
     def get_market(self, ticker: str) -> dict:
         """Retrieves detailed information and orderbook for a single market."""
         return self._send_request('GET', f'/trade-api/v2/markets/{ticker}')
 
-    def get_sports_market_prices(self) -> dict:
+    def stream_orderbooks(self, tickers: list, idle_timeout: float = None, timeout: float = None):
+        """
+        Generator that streams orderbooks for many markets over a single WebSocket
+        subscription, yielding (ticker, message) pairs as they arrive.
+
+        The first message for each ticker has type 'orderbook_snapshot' and carries
+        the full book; later 'orderbook_delta' messages update it.
+
+        Args:
+            tickers: Market tickers to subscribe to.
+            idle_timeout: Seconds to wait for a message before ending the stream
+                (optional, waits forever if not specified).
+            timeout: Total seconds to stream before ending, however busy the feed is
+                (optional, streams forever if not specified).
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._ws_connect() as ws:
+            ws.send(json.dumps({
+                "id": 1,
+                "cmd": "subscribe",
+                "params": {"channels": ["orderbook_delta"], "market_tickers": list(tickers)},
+            }))
+            while True:
+                wait = idle_timeout
+                if deadline is not None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return
+                    wait = remaining if wait is None else min(wait, remaining)
+                try:
+                    message = orjson.loads(ws.recv(timeout=wait))
+                except TimeoutError:
+                    return
+                if message.get('type') in ('orderbook_snapshot', 'orderbook_delta'):
+                    yield message['msg']['market_ticker'], message
+
+    def get_sports_market_prices(self, timeout: float = 10) -> dict:
         """
         Fetches all open sports markets and returns their orderbooks.
 
+        Args:
+            timeout: Seconds to wait for all orderbook snapshots in total; markets
+                whose snapshot hasn't arrived by then are left out.
+
         Returns:
             dict: A dictionary where keys are market titles and values are their
                   orderbooks.
         """
-        print("Fetching open sports markets...")
+        logger.info("Fetching open sports markets...")
+        titles = {}
         try:
-            response = self.get_markets(series_ticker='SPORT', status='open')
+            for markets_batch in self.get_markets_paginated(series_ticker='SPORT', status='open'):
+                for market in markets_batch:
+                    if market.get('ticker') and market.get('title'):
+                        titles[market['ticker']] = market['title']
         except Exception as e:
-            print(f"Could not fetch sports markets. The 'SPORT' series may not be active. Error: {e}")
+            logger.warning("Could not fetch sports markets. The 'SPORT' series may not be active. Error: %s", e)
             return {}
 
-        markets = response.get('markets', [])
-        if not markets:
-            print("No open sports markets found.")
+        if not titles:
+            logger.info("No open sports markets found.")
             return {}
 
-        print(f"Found {len(markets)} sports markets. Fetching orderbooks...")
+        logger.info("Found %d sports markets. Fetching orderbooks...", len(titles))
         market_prices = {}
-        for market in markets:
-            ticker = market.get('ticker')
-            title = market.get('title')
-            if not ticker or not title:
+        # Titles repeat across markets, so completion is tracked by ticker
+        snapshotted = set()
+        try:
+            for ticker, message in self.stream_orderbooks(list(titles), timeout=timeout):
+                if message['type'] != 'orderbook_snapshot' or ticker not in titles:
+                    continue
+                logger.debug("  - Got orderbook for %s (%s)", titles[ticker], ticker)
+                market_prices[titles[ticker]] = {
+                    'yes': message['msg'].get('yes', []),
+                    'no': message['msg'].get('no', []),
+                }
+                snapshotted.add(ticker)
+                if snapshotted == titles.keys():
+                    break
+        except Exception as e:
+            logger.warning("    Could not stream orderbooks: %s", e)
+        
+        return market_prices
+
+
+class KalshiMarketStream:
+    """
+    Keeps live top-of-book quotes for a set of markets using the Kalshi WebSocket
+    'ticker' channel, on a background thread.
+
+    Markets are seeded from REST snapshots via track() and dropped via untrack() or
+    once they are determined or settled. Every quote change updates the market dict
+    in place, and a copy of it is passed to on_update(market) on a separate worker
+    thread, so slow handlers never hold up reading the feed. If on_lifecycle is given,
+    market lifecycle events (markets opening, closing, settling) for all markets are
+    passed to it as well.
+    """
+
+    RECONNECT_DELAY = 5  # Seconds to wait before reconnecting a dropped stream
+    # Lifecycle events after which a market's quotes can no longer change
+    FINISHED_EVENTS = ('determined', 'settled')
+
+    def __init__(self, client: KalshiBaseClient, on_update=None, on_lifecycle=None):
+        """
+        Args:
+            client (KalshiBaseClient): Client used to authenticate the connection.
+            on_update (callable): Called with a copy of the market dict whenever its quotes change.
+            on_lifecycle (callable): Called with each market lifecycle event message.
+        """
+        self.client = client
+        self.on_update = on_update
+        self.on_lifecycle = on_lifecycle
+        self.markets_state = {}
+        self._subscribed = set()
+        # Server subscription id of each subscribed ticker, and the tickers of each
+        # subscribe command still awaiting its acknowledgement, keyed by command id
+        self._sids = {}
+        self._pending_subscribes = {}
+        # Tickers with a quote change waiting for on_update; repeated changes before
+        # the worker gets to a ticker are coalesced into one call with the latest quote
+        self._updates = queue.Queue()
+        self._queued = set()
+        self._ws = None
+        self._lock = threading.Lock()
+        self._msg_ids = itertools.count(1)
+
+    def start(self):
+        """Starts streaming, and dispatching updates to on_update, on daemon threads."""
+        threading.Thread(target=self._run, name="kalshi-market-stream", daemon=True).start()
+        if self.on_update is not None:
+            threading.Thread(target=self._dispatch, name="kalshi-market-updates", daemon=True).start()
+
+    def track(self, markets: list):
+        """Stores a copy of the latest REST snapshot of each market and subscribes to new tickers."""
+        with self._lock:
+            new_tickers = []
+            for market in markets:
+                ticker = market.get('ticker')
+                if not ticker:
+                    continue
+                # The stream updates its own copy, so callers can keep reading theirs
+                self.markets_state[ticker] = dict(market)
+                if ticker not in self._subscribed:
+                    new_tickers.append(ticker)
+            self._subscribed.update(new_tickers)
+            if new_tickers and self._ws is not None:
+                self._subscribe(new_tickers)
+
+    def untrack(self, tickers):
+        """Forgets markets that can no longer be traded and unsubscribes from their quotes."""
+        with self._lock:
+            by_sid = {}
+            for ticker in tickers:
+                if ticker not in self._subscribed:
+                    continue
+                self._subscribed.discard(ticker)
+                self.markets_state.pop(ticker, None)
+                self._queued.discard(ticker)
+                sid = self._sids.pop(ticker, None)
+                if sid is not None:
+                    by_sid.setdefault(sid, []).append(ticker)
+            if self._ws is None:
+                return
+            # Tickers whose subscribe isn't acknowledged yet have no sid to remove them
+            # from; their remaining messages are ignored since they have no market state
+            for sid, sid_tickers in by_sid.items():
+                self._ws.send(json.dumps({
+                    "id": next(self._msg_ids),
+                    "cmd": "update_subscription",
+                    "params": {"sids": [sid], "market_tickers": sid_tickers, "action": "delete_markets"},
+                }))
+
+    def _subscribe(self, tickers: list):
+        msg_id = next(self._msg_ids)
+        self._pending_subscribes[msg_id] = tickers
+        self._ws.send(json.dumps({
+            "id": msg_id,
+            "cmd": "subscribe",
+            "params": {"channels": ["ticker"], "market_tickers": tickers},
+        }))
+
+    def _run(self):
+        while True:
+            try:
+                with self.client._ws_connect() as ws:
+                    with self._lock:
+                        self._ws = ws
+                        # Subscription ids are per connection
+                        self._sids.clear()
+                        self._pending_subscribes.clear()
+                        if self._subscribed:
+                            self._subscribe(list(self._subscribed))
+                        # Lifecycle events are always needed to drop finished markets
+                        ws.send(json.dumps({
+                            "id": next(self._msg_ids),
+                            "cmd": "subscribe",
+                            "params": {"channels": ["market_lifecycle_v2"]},
+                        }))
+                    for raw in ws:
+                        self._handle(orjson.loads(raw))
+            except Exception as e:
+                logger.warning("Market stream disconnected: %s", e)
+            with self._lock:
+                self._ws = None
+            time.sleep(self.RECONNECT_DELAY)
+
+    def _handle(self, message: dict):
+        msg_type = message.get('type')
+        if msg_type == 'subscribed':
+            with self._lock:
+                tickers = self._pending_subscribes.pop(message.get('id'), None)
+                if tickers is not None:
+                    sid = message['msg'].get('sid')
+                    for ticker in tickers:
+                        if ticker in self._subscribed:
+                            self._sids[ticker] = sid
+            return
+        if msg_type == 'market_lifecycle_v2':
+            msg = message['msg']
+            if msg.get('event_type') in self.FINISHED_EVENTS:
+                self.untrack([msg.get('market_ticker')])
+            if self.on_lifecycle is not None:
+                self.on_lifecycle(msg)
+            return
+        if msg_type != 'ticker':
+            return
+        msg = message['msg']
+        ticker = msg.get('market_ticker')
+        yes_bid = msg.get('yes_bid')
+        yes_ask = msg.get('yes_ask')
+        if yes_bid is None or yes_ask is None:
+            return
+
+        # NO quotes mirror the YES side of the book
+        quote = {'yes_bid': yes_bid, 'yes_ask': yes_ask, 'no_bid': 100 - yes_ask, 'no_ask': 100 - yes_bid}
+        with self._lock:
+            market = self.markets_state.get(ticker)
+            if market is None or all(market.get(k) == v for k, v in quote.items()):
+                return
+            market.update(quote)
+            if self.on_update is None or ticker in self._queued:
+                return
+            self._queued.add(ticker)
+        self._updates.put(ticker)
+
+    def _dispatch(self):
+        while True:
+            ticker = self._updates.get()
+            with self._lock:
+                if ticker not in self._queued:
+                    continue  # Untracked while waiting
+                self._queued.discard(ticker)
+                market = self.markets_state.get(ticker)
+                # Hand over a copy so the handler sees one consistent quote
+                market = dict(market) if market is not None else None
+            if market is None:
                 continue
-            
-            print(f"  - Getting orderbook for {title} ({ticker})")
             try:
-                market_details = self.get_market(ticker)
-                if 'orderbook' in market_details:
-                    market_prices[title] = market_details['orderbook']
+                self.on_update(market)
             except Exception as e:
-                print(f"    Could not retrieve orderbook for {ticker}: {e}")
-        
-        return market_prices
+                logger.error("Market update handler failed for %s: %s", ticker, e)
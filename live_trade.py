@@ -1,41 +1,89 @@
+import atexit
+import logging
 import os
+import queue
+import threading
 import time
-import math
-from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from itertools import repeat
+from logging.handlers import QueueHandler, QueueListener
 from dotenv import load_dotenv
-from kalshi_client import KalshiTrader, KalshiMarketData, Environment
+from kalshi_client import KalshiTrader, KalshiMarketData, KalshiMarketStream, Environment
 
-def should_trade_market(market):
-    """Check if market is eligible for trading."""
-    expected_expiration = market.get('expected_expiration_time')
-    if not expected_expiration:
-        return False
-    
-    exp_dt = datetime.fromisoformat(expected_expiration.replace('Z', '+00:00'))
-    now = datetime.now(exp_dt.tzinfo)
-    
-    # Only trade markets expiring within next 4 hours
-    if exp_dt > now + timedelta(hours=4):
+logger = logging.getLogger(__name__)
+
+def expiration_ts(market):
+    """Return the market's expected expiration as a unix timestamp, cached on the market."""
+    exp_ts = market.get('_exp_ts')
+    if exp_ts is None:
+        expected_expiration = market.get('expected_expiration_time')
+        if not expected_expiration:
+            return None
+        exp_ts = int(datetime.fromisoformat(expected_expiration.replace('Z', '+00:00')).timestamp())
+        market['_exp_ts'] = exp_ts
+    return exp_ts
+
+def trading_window(now_ts, is_nhl):
+    """Return the (earliest, latest) expirations, as unix times, of markets tradable at now_ts."""
+    # Only trade markets expiring within next 4 hours, skipping those expiring in
+    # less than 1 hour (NHL) or 1 hour 30 minutes (everything else)
+    return now_ts + (3600 if is_nhl else 90 * 60), now_ts + 4 * 3600
+
+def should_trade_market(market, now_ts, is_nhl):
+    """Check if market is eligible for trading as of the unix time now_ts."""
+    exp_ts = expiration_ts(market)
+    if exp_ts is None:
         return False
+    earliest, latest = trading_window(now_ts, is_nhl)
+    return earliest <= exp_ts <= latest
+
+def decide(is_nhl, yes_bid, yes_ask, no_bid, no_ask, spread_threshold, low_mult_milli, high_mult_milli):
+    """
+    Pure pricing decision for one market, on integer quotes in cents.
+
+    Multipliers are in thousandths of the bid so all arithmetic stays integer.
+    Returns (place_yes, yes_price, yes_low_spread, place_no, no_price, no_low_spread);
+    a side's price is None when its quotes don't qualify for evaluation.
+    """
+    place_yes, yes_price, yes_low_spread = False, None, False
+    place_no, no_price, no_low_spread = False, None, False
     
-    # Skip markets expiring in less than 1 hour 30 minutes
-    if 'NHL' in market.get('ticker'):
-        if exp_dt < now + timedelta(hours=1):
-            return False
-    else:
-        if exp_dt < now + timedelta(hours=1, minutes=30):
-            return False
+    # YES side (a bid above 56 is traded even when the ask is 0)
+    if yes_bid is not None and yes_ask is not None and ((yes_bid and yes_ask) or yes_bid > 56):
+        spread = yes_ask - yes_bid
+        yes_low_spread = spread < spread_threshold or yes_bid > 54
+        if yes_low_spread:
+            if is_nhl:
+                yes_price = yes_bid - 3
+            elif yes_bid > 59:
+                yes_price = yes_bid * 850 // 1000  # 15% below bid
+            else:
+                yes_price = yes_bid * low_mult_milli // 1000
+        else:
+            # High spread: discount below ask
+            yes_price = yes_bid * high_mult_milli // 1000
+        place_yes = 7 < yes_price < 99 or spread > spread_threshold
     
+    # NO side
+    if no_bid and no_ask and not is_nhl:
+        spread = no_ask - no_bid
+        no_low_spread = spread < spread_threshold
+        # Discount below bid
+        no_price = no_bid * (low_mult_milli if no_low_spread else high_mult_milli) // 1000
+        place_no = 7 <= no_price <= 99 or spread > spread_threshold
     
-    return True
+    return place_yes, yes_price, yes_low_spread, place_no, no_price, no_low_spread
 
-def calculate_order_expiration(order_expiry_minutes):
-    """Calculate order expiration based on configurable minutes from now."""
-    order_exp = datetime.now() + timedelta(minutes=order_expiry_minutes)
-    return int(order_exp.timestamp())
+def trade_market(pending_orders, market, contracts_per_order, spread_threshold, low_mult_milli, high_mult_milli, low_exp_ts, high_exp_ts, is_nhl, dry_run=False):
+    """
+    Decide trades on a single market based on spread and queue them on pending_orders.
+    Returns whether any order was queued.
 
-def trade_market(trader, market, contracts_per_order, spread_threshold, low_spread_discount_pct, high_spread_discount_pct, low_spread_expiry_min, high_spread_expiry_min, dry_run=False):
-    """Execute trades on a single market based on spread."""
+    low_mult_milli/high_mult_milli are the bid multipliers for low and high spreads in
+    thousandths, low_exp_ts/high_exp_ts the matching order expiration unix timestamps, and
+    is_nhl whether the market belongs to an NHL series.
+    """
     ticker = market.get('ticker')
     title = market.get('title')
     yes_bid = market.get('yes_bid')
@@ -43,59 +91,73 @@ def trade_market(trader, market, contracts_per_order, spread_threshold, low_spre
     no_bid = market.get('no_bid')
     no_ask = market.get('no_ask')
     
-    # Trade YES side
-    if yes_bid and yes_ask or yes_bid > 56:
-        spread = yes_ask - yes_bid
-        
-        if spread < spread_threshold or yes_bid > 54:
-            if 'NHL' in ticker:
-                price = yes_bid-3
-            elif yes_bid > 59:
-                price = math.floor(yes_bid * (1 - 15 / 100))
-            else:
-                price = math.floor(yes_bid * (1 - low_spread_discount_pct / 100))
-            expiration_ts = calculate_order_expiration(low_spread_expiry_min)
-            print(f"{title} - {ticker}: YES spread={spread}, bid={yes_bid} ask={yes_ask}, order_price={price} ({low_spread_discount_pct}% below ask, {low_spread_expiry_min}min expiry)")
-        else:
-            # High spread: discount below ask
-            price = math.floor(yes_bid * (1 - high_spread_discount_pct / 100))
-            expiration_ts = calculate_order_expiration(high_spread_expiry_min)
-            print(f"{title} - {ticker}: YES spread={spread}, bid={yes_bid}, ask={yes_ask}, order_price={price} ({high_spread_discount_pct}% below ask, {high_spread_expiry_min}min expiry)")
+    place_yes, yes_price, yes_low_spread, place_no, no_price, no_low_spread = decide(
+        is_nhl, yes_bid, yes_ask, no_bid, no_ask, spread_threshold, low_mult_milli, high_mult_milli)
+    
+    queued = False
+    for side, bid, ask, price, low_spread, place in (('YES', yes_bid, yes_ask, yes_price, yes_low_spread, place_yes),
+                                                     ('NO', no_bid, no_ask, no_price, no_low_spread, place_no)):
+        if price is None:
+            continue
+        expiration_ts = low_exp_ts if low_spread else high_exp_ts
+        # Log the offset actually applied; NHL and favourite prices don't use the multipliers
+        logger.info("%s - %s: %s spread=%d, bid=%d, ask=%d, order_price=%d (bid%+d, expires %d)",
+                    title, ticker, side, ask - bid, bid, ask, price, price - bid, expiration_ts)
         
-        if 7 < price < 99 or spread > spread_threshold:
+        if place:
             if dry_run:
-                print(f"🔍 DRY RUN: Would place YES order at {price}")
+                logger.info("🔍 DRY RUN: Would place %s order at %d", side, price)
+            elif not 1 <= price <= 99:
+                logger.warning("⚠️ %s order price %d out of range (1-99)", side, price)
             else:
-                try:
-                    trader.buy_yes(ticker, contracts_per_order, price, expiration_ts)
-                    print(f"✅ YES order placed at {price}")
-                except Exception as e:
-                    print(f"❌ YES order failed: {e}")
-    
-    # Trade NO side
-    if no_bid and no_ask and 'NHL' not in ticker:
-        spread = no_ask - no_bid
-        
-        if spread < spread_threshold:
-        # Low spread: discount below bid
-            price = math.floor(no_bid * (1 - low_spread_discount_pct / 100))
-            expiration_ts = calculate_order_expiration(low_spread_expiry_min)
-            print(f"{title} - {ticker}: NO bid={no_bid}, bid={no_bid}, ask={no_ask}, spread={spread}, order_price={price} ({low_spread_discount_pct}% below bid, {low_spread_expiry_min}min expiry)")
+                pending_orders.append({'ticker': ticker, 'action': 'buy', 'side': side.lower(), 'count': contracts_per_order, 'price_cents': price, 'expiration_ts': expiration_ts})
+                queued = True
+    return queued
+
+def is_duplicate_order_error(error):
+    """Whether an order error means the same client_order_id was already placed."""
+    code = error.get('code') if isinstance(error, dict) else error
+    return 'duplicate_client_order_id' in str(code)
+
+def place_pending_orders(trader, pending_orders):
+    """
+    Submit queued orders in one batched request and report each result.
+    Returns the set of tickers none of whose orders were placed.
+    """
+    if not pending_orders:
+        return set()
+    try:
+        results = trader.place_orders_batch(pending_orders).get('orders', [])
+    except Exception as e:
+        # The batch may still have been applied (e.g. a timeout after it landed), so
+        # keep its markets held back until their orders would have expired
+        logger.error("❌ Batch of %d orders failed: %s", len(pending_orders), e)
+        return set()
+    failed, placed = set(), set()
+    for order, result in zip(pending_orders, results):
+        side = order['side'].upper()
+        error = result.get('error')
+        if error and not is_duplicate_order_error(error):
+            logger.error("❌ %s order failed for %s: %s", side, order['ticker'], error)
+            failed.add(order['ticker'])
         else:
-            # High spread: discount below bid
-            price = math.floor(no_bid * (1 - high_spread_discount_pct / 100))
-            expiration_ts = calculate_order_expiration(high_spread_expiry_min)
-            print(f"{title} - {ticker}: NO bid={no_bid}, bid={no_bid}, ask={no_ask}, spread={spread}, order_price={price} ({high_spread_discount_pct}% below bid, {high_spread_expiry_min}min expiry)")
-        
-        if 7 <= price <= 99 or spread > spread_threshold:
-            if dry_run:
-                print(f"🔍 DRY RUN: Would place NO order at {price}")
-            else:
-                try:
-                    trader.buy_no(ticker, contracts_per_order, price, expiration_ts)
-                    print(f"✅ NO order placed at {price}")
-                except Exception as e:
-                    print(f"❌ NO order failed: {e}")
+            # A duplicate client_order_id means an earlier attempt of this order was placed
+            logger.info("✅ %s order placed for %s at %d", side, order['ticker'], order['price_cents'])
+            placed.add(order['ticker'])
+    return failed - placed
+
+def setup_logging():
+    """Log through a queue so the actual writes to stderr happen on a background thread."""
+    log_queue = queue.Queue(-1)
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    listener = QueueListener(log_queue, handler)
+    
+    root = logging.getLogger()
+    root.addHandler(QueueHandler(log_queue))
+    root.setLevel(logging.INFO)
+    listener.start()
+    atexit.register(listener.stop)
 
 def main():
     load_dotenv()
@@ -107,7 +169,11 @@ def main():
     HIGH_SPREAD_DISCOUNT_PCT = -6  # Percentage below ask when spread >= threshold (0 = at ask)
     LOW_SPREAD_EXPIRY_MIN = 2  # Minutes until order expires for low spread
     HIGH_SPREAD_EXPIRY_MIN = 1  # Minutes until order expires for high spread
-    THROTTLE_DELAY = 0.5  # Seconds to wait between each trade to avoid rate limiting
+    MARKETS_PAGE_SIZE = 1000  # Markets per page; the API maximum, so most series fit in one request
+    BLACKLISTED_TEAMS = ('Tulane',)  # Never trade markets whose title names one of these teams
+    SCAN_INTERVAL = 60  # Max seconds between scans when no new markets are announced
+    RESCAN_DEBOUNCE = 5  # Seconds to gather lifecycle events before rescanning their series
+    SCAN_CONCURRENCY = 8  # Max series scanned at once; the client's rate limiter paces requests
     
     is_production = os.environ.get("IS_PRODUCTION", "False").lower() == "true"
     environment = Environment.PROD if is_production else Environment.DEMO
@@ -117,49 +183,174 @@ def main():
     contracts_per_order = int(os.environ.get("CONTRACTS_PER_ORDER", "100"))
     
     if not api_key_id or not private_key_path:
-        print("Error: API credentials not found in .env")
+        logger.error("Error: API credentials not found in .env")
         return
     
-    print(f"🚀 Starting live sports trader ({environment.name} mode)")
+    logger.info("🚀 Starting live sports trader (%s mode)", environment.name)
     if DRY_RUN:
-        print("⚠️  DRY RUN MODE - Orders will NOT be placed")
+        logger.warning("⚠️  DRY RUN MODE - Orders will NOT be placed")
     
     market_data = KalshiMarketData(api_key_id, private_key_path, environment)
     trader = KalshiTrader(api_key_id, private_key_path, environment)
+    trader.warm_connection()
     
     # Sports series to monitor
     sports_series = ['KXNCAAMBSPREAD', 'KXNCAAMBTOTAL', 'KXNBASPREAD', 'KXNBATOTAL', 'KXNHLTOTAL', 'KXNFLTOTAL', 'KXNFLSPREAD']
     
-    traded_markets = set()
+    # Ticker -> unix time until which the market's last orders may still be resting
+    traded_markets = {}
+    # The scan threads and the quote stream both trade markets, so checking and
+    # claiming a ticker in traded_markets has to be one step
+    traded_markets_lock = threading.Lock()
+    order_lifetime = max(LOW_SPREAD_EXPIRY_MIN, HIGH_SPREAD_EXPIRY_MIN) * 60
+    
+    # Bid multipliers (in thousandths) are constant for the run; only expirations depend on the scan time
+    low_mult_milli = 1000 - LOW_SPREAD_DISCOUNT_PCT * 10
+    high_mult_milli = 1000 - HIGH_SPREAD_DISCOUNT_PCT * 10
+    
+    # Ticker -> whether the market's title names a blacklisted team; titles don't
+    # change, so each title is searched once while its market can be traded
+    blacklist_cache = {}
+    
+    def is_blacklisted(market):
+        """Checks a market against BLACKLISTED_TEAMS, caching the result per ticker."""
+        ticker = market.get('ticker')
+        blacklisted = blacklist_cache.get(ticker)
+        if blacklisted is None:
+            title = market.get('title') or ''
+            blacklisted = blacklist_cache[ticker] = any(team in title for team in BLACKLISTED_TEAMS)
+        return blacklisted
+    
+    def consider_market(market, pending_orders, now_ts, is_nhl):
+        """Queues trades for a market if it is eligible and records when its orders expire, if any were queued."""
+        ticker = market.get('ticker')
+        with traded_markets_lock:
+            # Skip markets whose last orders are still resting; forget them once they expire
+            live_until = traded_markets.get(ticker)
+            if live_until is not None:
+                if live_until > now_ts:
+                    return
+                traded_markets.pop(ticker, None)
+            if is_blacklisted(market) or not should_trade_market(market, now_ts, is_nhl):
+                return
+            # Claim the market before pricing it so no other thread queues orders for it meanwhile
+            traded_markets[ticker] = now_ts + order_lifetime
+        
+        logger.info("🎯 Trading: %s", market.get('title'))
+        queued = trade_market(pending_orders, market, contracts_per_order, SPREAD_THRESHOLD, 
+                   low_mult_milli, high_mult_milli,
+                   now_ts + LOW_SPREAD_EXPIRY_MIN * 60, now_ts + HIGH_SPREAD_EXPIRY_MIN * 60, is_nhl, DRY_RUN)
+        if not queued:
+            # Nothing will rest on the book, so keep re-evaluating the market
+            release_markets((ticker,))
+    
+    def release_markets(tickers):
+        """Forgets markets that ended up with no resting orders."""
+        with traded_markets_lock:
+            for ticker in tickers:
+                traded_markets.pop(ticker, None)
+    
+    def forget_markets(tickers):
+        """Drops all per-market state for markets that can no longer be traded."""
+        with traded_markets_lock:
+            for ticker in tickers:
+                traded_markets.pop(ticker, None)
+                blacklist_cache.pop(ticker, None)
     
+    def flush_orders(pending_orders):
+        """Places queued orders and releases the markets whose orders all failed."""
+        release_markets(place_pending_orders(trader, pending_orders))
+    
+    def on_quote_change(market):
+        """Re-evaluates a market as soon as its quotes move."""
+        pending_orders = []
+        consider_market(market, pending_orders, int(time.time()), market.get('ticker', '').startswith('KXNHL'))
+        flush_orders(pending_orders)
+    
+    rescan = threading.Event()
+    # Series with lifecycle events since their last scan, guarded by changed_series_lock
+    changed_series = set()
+    changed_series_lock = threading.Lock()
+    monitored_series = frozenset(sports_series)
+    
+    def on_market_lifecycle(msg):
+        """Wakes the scanner early to rescan the series of a market that changed state."""
+        # Market tickers are the series ticker followed by '-' and the event and market ids
+        ticker = msg.get('market_ticker', '')
+        if msg.get('event_type') in KalshiMarketStream.FINISHED_EVENTS:
+            forget_markets((ticker,))
+        series = ticker.partition('-')[0]
+        if series in monitored_series:
+            with changed_series_lock:
+                changed_series.add(series)
+            rescan.set()
+    
+    # REST scans provide snapshots and discover new markets; quote changes in between
+    # arrive over the WebSocket feed and are traded immediately
+    stream = KalshiMarketStream(market_data, on_update=on_quote_change, on_lifecycle=on_market_lifecycle)
+    stream.start()
+    
+    def scan_series(series, now_ts):
+        """Fetches every open market in a series and trades the eligible ones."""
+        logger.info("📊 Checking %s...", series)
+        pending_orders = []
+        # Every market in a series shares its league, so check for NHL once per series
+        series_is_nhl = series.startswith('KXNHL')
+        
+        try:
+            earliest, latest = trading_window(now_ts, series_is_nhl)
+            for markets_batch in market_data.get_markets_paginated(series_ticker=series, limit=MARKETS_PAGE_SIZE, status='open'):
+                # Narrow the page to the trading window in one pass and run the full checks,
+                # and the quote stream, on those alone; markets outside it are unsubscribed
+                in_window, out_of_window = [], []
+                for m in markets_batch:
+                    exp_ts = expiration_ts(m)
+                    if exp_ts is not None and earliest <= exp_ts <= latest:
+                        in_window.append(m)
+                    else:
+                        out_of_window.append(m.get('ticker'))
+                stream.untrack(out_of_window)
+                forget_markets(out_of_window)
+                stream.track(in_window)
+                for market in in_window:
+                    consider_market(market, pending_orders, now_ts, series_is_nhl)
+                    
+        except Exception as e:
+            logger.error("❌ Error processing %s: %s", series, e)
+        
+        # Submit everything the series scan decided on in one batched request
+        flush_orders(pending_orders)
+    
+    executor = ThreadPoolExecutor(max_workers=SCAN_CONCURRENCY)
+    
+    next_full_scan = 0
     while True:
-        print(f"\n{'='*60}")
-        print(f"🔄 Scanning markets at {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-        print(f"{'='*60}")
+        if time.time() >= next_full_scan:
+            series_to_scan = sports_series
+            next_full_scan = time.time() + SCAN_INTERVAL
+            rescan.clear()
+            with changed_series_lock:
+                changed_series.clear()
+        else:
+            # Woken by lifecycle events: let a burst of them settle, then rescan only
+            # the series they belong to
+            time.sleep(RESCAN_DEBOUNCE)
+            rescan.clear()
+            with changed_series_lock:
+                series_to_scan = [series for series in sports_series if series in changed_series]
+                changed_series.clear()
         
-        for series in sports_series:
-            print(f"\n📊 Checking {series}...")
-            
-            try:
-                for markets_batch in market_data.get_markets_paginated(series_ticker=series, limit=12, status='open'):
-                    for market in markets_batch:
-                        ticker = market.get('ticker')
-
-                        if not should_trade_market(market) or 'Tulane' in market.get('title'):
-                            continue
-                        
-                        print(f"\n🎯 Trading: {market.get('title')}")
-                        trade_market(trader, market, contracts_per_order, SPREAD_THRESHOLD, 
-                                   LOW_SPREAD_DISCOUNT_PCT, HIGH_SPREAD_DISCOUNT_PCT,
-                                   LOW_SPREAD_EXPIRY_MIN, HIGH_SPREAD_EXPIRY_MIN, DRY_RUN)
-                        traded_markets.add(ticker)
-                    time.sleep(THROTTLE_DELAY)  # Prevent rate limiting
-                        
-            except Exception as e:
-                print(f"❌ Error processing {series}: {e}")
+        logger.info("=" * 60)
+        logger.info("🔄 Scanning %d series at %s", len(series_to_scan), datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+        logger.info("=" * 60)
+        
+        # Scan the series concurrently and wait for the whole pass to finish
+        list(executor.map(scan_series, series_to_scan, repeat(int(time.time()))))
         
-        print(f"\n💤 Sleeping 60 seconds... (Traded {len(traded_markets)} markets)")
-        time.sleep(100)
+        wait = max(0, next_full_scan - time.time())
+        logger.info("💤 Waiting up to %d seconds for market changes... (%d markets with live orders)", wait, len(traded_markets))
+        rescan.wait(timeout=wait)
 
 if __name__ == "__main__":
+    setup_logging()
     main()